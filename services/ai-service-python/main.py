@@ -1,19 +1,39 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
 import numpy as np
+from numba import njit
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+from sklearn.preprocessing import normalize
+import scipy.sparse as sp
+import joblib
+from transformers import pipeline, AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from optimum.pipelines import pipeline as ort_pipeline
+import onnxruntime as ort
+import torch
 import nltk
 from textblob import TextBlob
-from langdetect import detect
-import redis
-import pymongo
+import ahocorasick
+import redis.asyncio as aioredis
+from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List, Optional, Dict
-import json
+from collections import Counter
+import heapq
+import orjson
+from cachetools import TTLCache
+import hashlib
 import os
+import fcntl
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import functools
 from datetime import datetime, timedelta
 import asyncio
 import logging
@@ -26,7 +46,7 @@ try:
 except:
     pass
 
-app = FastAPI(title="Crown AI Service", version="1.0.0")
+app = FastAPI(title="Crown AI Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -46,9 +66,81 @@ recommendation_model = None
 redis_client = None
 mongo_client = None
 
+# In-process L1 cache in front of Redis, plus in-flight computations by cache key
+L1_CACHE_SIZE = 10000
+L1_CACHE_TTL = 3600
+l1_cache = TTLCache(maxsize=L1_CACHE_SIZE, ttl=L1_CACHE_TTL)
+inflight: Dict[str, asyncio.Future] = {}
+
+# Dynamic batching for transformer inference
+MAX_BATCH = 16
+BATCH_WINDOW = 0.01  # seconds to wait for more requests before running a batch
+sentiment_queue = None
+moderation_queue = None
+
+# Input bounds: attention cost grows quadratically with sequence length
+MAX_CONTENT_LENGTH = 10000  # rejected at validation
+MAX_MODEL_CHARS = 2000  # characters passed to the tokenizer
+TOKENIZER_KWARGS = {"truncation": True, "max_length": 256, "padding": True}
+
+# Batched Redis reads (MGET) and writes (pipelined SETEX)
+cache_read_queue = None
+cache_write_queue = None
+
+# Recommendation candidate window
+MAX_CANDIDATES = 1000
+CANDIDATE_BATCH_SIZE = 200
+
+# Long-running startup tasks (batch workers, periodic refreshes)
+background_jobs = []
+
+# Shared TF-IDF vectorizer, refit daily by the launcher process and reloaded by workers
+VECTORIZER_PATH = os.getenv('VECTORIZER_PATH', './models/tfidf_vectorizer.joblib')
+VECTORIZER_SAMPLE_SIZE = 50000
+VECTORIZER_REFRESH_INTERVAL = 24 * 3600
+VECTORIZER_RELOAD_INTERVAL = 300
+VECTORIZER_RETRY_INTERVAL = 60
+tfidf_vectorizer = None
+
+# Keyword categories checked on toxic content: category -> (keywords, risk increment)
+KEYWORD_CATEGORIES = {
+    "hate_speech": (['hate', 'racist', 'homophobic', 'sexist'], 0.2),
+    "violence": (['kill', 'murder', 'violence', 'attack'], 0.3),
+    "adult_content": (['explicit', 'nsfw', 'adult'], 0.1),
+}
+
+def build_keyword_automaton() -> ahocorasick.Automaton:
+    """Compile all category keywords into one Aho-Corasick automaton"""
+    automaton = ahocorasick.Automaton()
+    for category, (words, _) in KEYWORD_CATEGORIES.items():
+        for word in words:
+            automaton.add_word(word, (category, word))
+    automaton.make_automaton()
+    return automaton
+
+keyword_automaton = build_keyword_automaton()
+
+# Worker processes and the inference threads each of them may use. Both models run
+# on a single executor thread, so one batch at a time per worker and all workers
+# together use about one compute thread per core.
+SERVICE_WORKERS = int(os.getenv('AI_SERVICE_WORKERS', 2))
+INFERENCE_THREADS = max(1, (os.cpu_count() or 1) // SERVICE_WORKERS)
+inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+# Quantized ONNX model cache
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', './onnx_models')
+
+# Inference backend: "onnx" (INT8 ONNX Runtime), "ipex" (BF16 Intel Extension for PyTorch,
+# needs intel-extension-for-pytorch installed separately) or "torch" (FP32 PyTorch with
+# weights memory-mapped and shared between workers)
+MODEL_BACKEND = os.getenv('AI_MODEL_BACKEND', 'onnx')
+
+# Shared PyTorch checkpoints mapped read-only by every worker process
+SHARED_MODEL_DIR = os.getenv('SHARED_MODEL_DIR', './shared_models')
+
 class PostAnalysis(BaseModel):
     post_id: str
-    content: str
+    content: str = Field(max_length=MAX_CONTENT_LENGTH)
     user_id: str
 
 class SentimentResult(BaseModel):
@@ -72,10 +164,413 @@ class UserInterest(BaseModel):
     interests: List[str]
     interaction_history: List[Dict]
 
+def ckey(prefix: str, s: str) -> str:
+    """Build a cache key that is stable across processes and restarts"""
+    return f"{prefix}:{hashlib.blake2b(s.encode('utf-8'), digest_size=16).hexdigest()}"
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """Hold an exclusive lock so only one process builds a shared artifact at a time.
+
+    Yields whether the lock was acquired, which is only ever False when
+    blocking is disabled and another process already holds it.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def train_vectorizer(corpus: List[str]) -> TfidfVectorizer:
+    """Fit a TF-IDF vectorizer on the given corpus and persist it"""
+    vectorizer = TfidfVectorizer(max_features=20000, stop_words='english', dtype=np.float32).fit(corpus)
+    
+    # Write to a temporary file first so readers never load a partial artifact
+    os.makedirs(os.path.dirname(VECTORIZER_PATH) or '.', exist_ok=True)
+    tmp_path = f"{VECTORIZER_PATH}.{os.getpid()}.tmp"
+    joblib.dump(vectorizer, tmp_path)
+    os.replace(tmp_path, VECTORIZER_PATH)
+    return vectorizer
+
+async def fit_vectorizer(db) -> Optional[TfidfVectorizer]:
+    """Fit the shared TF-IDF vectorizer on a sample of posts"""
+    corpus = [
+        post.get('content', '')
+        async for post in db.posts.aggregate([
+            {"$match": {"isActive": True}},
+            {"$sample": {"size": VECTORIZER_SAMPLE_SIZE}},
+            {"$project": {"content": 1}}
+        ])
+    ]
+    if not corpus:
+        return None
+    
+    return await asyncio.to_thread(train_vectorizer, corpus)
+
+async def refit_vectorizer() -> Optional[TfidfVectorizer]:
+    """Fit the shared vectorizer with a dedicated MongoDB connection"""
+    client = AsyncIOMotorClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017'))
+    try:
+        return await fit_vectorizer(client['crown-social'])
+    finally:
+        client.close()
+
+def vectorizer_refit_loop():
+    """Refit the shared vectorizer once a day in the launcher process.
+
+    Workers reload the saved file, so all of them score with the same
+    vocabulary and IDF weights. Until a first fit succeeds, it is retried
+    every VECTORIZER_RETRY_INTERVAL seconds. The daily refit only runs when
+    the service is started with `python main.py`; under `uvicorn main:app`
+    a worker builds the vectorizer once and it is never refreshed.
+    """
+    logger = logging.getLogger(__name__)
+    delay = VECTORIZER_REFRESH_INTERVAL if os.path.exists(VECTORIZER_PATH) else 0
+
+    while True:
+        time.sleep(delay)
+        bootstrapping = not os.path.exists(VECTORIZER_PATH)
+        fitted = False
+        try:
+            with file_lock(f"{VECTORIZER_PATH}.lock"):
+                # A worker may have built the first vectorizer while we waited for the lock
+                if bootstrapping and os.path.exists(VECTORIZER_PATH):
+                    fitted = True
+                elif asyncio.run(refit_vectorizer()) is not None:
+                    fitted = True
+                    logger.info("✅ TF-IDF vectorizer refit")
+                else:
+                    logger.warning("⚠️ TF-IDF vectorizer refit skipped: no active posts")
+        except Exception as e:
+            logger.error(f"❌ TF-IDF vectorizer refit failed: {e}")
+        fitted = fitted or os.path.exists(VECTORIZER_PATH)
+        delay = VECTORIZER_REFRESH_INTERVAL if fitted else VECTORIZER_RETRY_INTERVAL
+
+async def reload_vectorizer():
+    """Load the shared vectorizer whenever the launcher writes a new version.
+
+    If no vectorizer has been written yet, e.g. when started with
+    `uvicorn main:app` and no launcher runs, one worker fits it under the
+    shared lock while the others keep polling for the file.
+    """
+    global tfidf_vectorizer
+    logger = logging.getLogger(__name__)
+    loaded_mtime = None
+
+    while True:
+        try:
+            try:
+                mtime = os.path.getmtime(VECTORIZER_PATH)
+            except FileNotFoundError:
+                mtime = None
+            if mtime is None and mongo_client:
+                with file_lock(f"{VECTORIZER_PATH}.lock", blocking=False) as acquired:
+                    if acquired and not os.path.exists(VECTORIZER_PATH):
+                        vectorizer = await fit_vectorizer(mongo_client['crown-social'])
+                        if vectorizer is not None:
+                            tfidf_vectorizer = vectorizer
+                            loaded_mtime = os.path.getmtime(VECTORIZER_PATH)
+                            logger.info("✅ TF-IDF vectorizer fitted")
+            elif mtime is not None and mtime != loaded_mtime:
+                tfidf_vectorizer = await asyncio.to_thread(joblib.load, VECTORIZER_PATH)
+                loaded_mtime = mtime
+                logger.info("✅ TF-IDF vectorizer loaded")
+        except Exception as e:
+            logger.error(f"❌ TF-IDF vectorizer loading failed: {e}")
+        await asyncio.sleep(VECTORIZER_RELOAD_INTERVAL if loaded_mtime is not None else VECTORIZER_RETRY_INTERVAL)
+
+@njit(cache=True)
+def is_word_char(cp):
+    """Letters and digits, including the Latin ranges used by Vietnamese"""
+    return (
+        (cp >= 97 and cp <= 122) or (cp >= 65 and cp <= 90) or (cp >= 48 and cp <= 57)
+        # Latin-1 letters (skipping the multiplication and division signs) and Latin Extended-A/B
+        or (cp >= 0x00C0 and cp <= 0x024F and cp != 0x00D7 and cp != 0x00F7)
+        or (cp >= 0x0300 and cp <= 0x036F)  # combining diacritical marks
+        or (cp >= 0x0370 and cp <= 0x03FF and cp != 0x037E and cp != 0x0387)  # Greek
+        or (cp >= 0x0400 and cp <= 0x04FF)  # Cyrillic
+        or (cp >= 0x1E00 and cp <= 0x1EFF)  # Latin Extended Additional (Vietnamese)
+    )
+
+@njit(cache=True)
+def keyword_spans(buf, min_chars):
+    """Return (start, end) byte offsets of word runs in UTF-8 text with at least min_chars characters"""
+    n = buf.shape[0]
+    spans = np.empty((n // 2 + 1, 2), dtype=np.int64)
+    count = 0
+    start = -1
+    chars = 0
+    i = 0
+    while i < n:
+        # Decode one UTF-8 code point
+        b = buf[i]
+        if b < 0x80:
+            cp = np.int64(b)
+            width = 1
+        elif b >= 0xF0 and i + 3 < n:
+            cp = ((b & 0x07) << 18) | ((buf[i + 1] & 0x3F) << 12) | ((buf[i + 2] & 0x3F) << 6) | (buf[i + 3] & 0x3F)
+            width = 4
+        elif b >= 0xE0 and i + 2 < n:
+            cp = ((b & 0x0F) << 12) | ((buf[i + 1] & 0x3F) << 6) | (buf[i + 2] & 0x3F)
+            width = 3
+        elif b >= 0xC0 and i + 1 < n:
+            cp = ((b & 0x1F) << 6) | (buf[i + 1] & 0x3F)
+            width = 2
+        else:
+            cp = np.int64(-1)
+            width = 1
+        
+        if is_word_char(cp):
+            if start < 0:
+                start = i
+                chars = 0
+            chars += 1
+        elif start >= 0:
+            if chars >= min_chars:
+                spans[count, 0] = start
+                spans[count, 1] = i
+                count += 1
+            start = -1
+        i += width
+    if start >= 0 and chars >= min_chars:
+        spans[count, 0] = start
+        spans[count, 1] = n
+        count += 1
+    return spans[:count]
+
+def extract_keywords(text: str):
+    """Yield lowercased keywords longer than 3 characters as UTF-8 bytes"""
+    raw = text.lower().encode('utf-8')
+    spans = keyword_spans(np.frombuffer(raw, dtype=np.uint8), 4)
+    return (raw[start:end] for start, end in spans.tolist())
+
+def load_quantized_pipeline(task: str, model_name: str):
+    """Export a model to ONNX, quantize it to INT8 and wrap it in a pipeline"""
+    save_dir = os.path.join(ONNX_MODEL_DIR, model_name.replace('/', '--'))
+    quantized_file = "model_quantized.onnx"
+    
+    # Export and quantize once, later startups reuse the saved model. Workers start
+    # together, so one builds it in a temporary directory while the others wait.
+    if not os.path.exists(os.path.join(save_dir, quantized_file)):
+        with file_lock(f"{save_dir}.lock"):
+            if not os.path.exists(os.path.join(save_dir, quantized_file)):
+                tmp_dir = f"{save_dir}.{os.getpid()}.tmp"
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                onnx_model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+                quantizer = ORTQuantizer.from_pretrained(onnx_model)
+                quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+                quantizer.quantize(save_dir=tmp_dir, quantization_config=quantization_config)
+                
+                # Clear any leftovers from an interrupted build before moving into place
+                shutil.rmtree(save_dir, ignore_errors=True)
+                os.replace(tmp_dir, save_dir)
+    
+    sess_options = ort.SessionOptions()
+    sess_options.intra_op_num_threads = INFERENCE_THREADS
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    
+    model = ORTModelForSequenceClassification.from_pretrained(
+        save_dir,
+        file_name=quantized_file,
+        session_options=sess_options
+    )
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    
+    return ort_pipeline(task, model=model, tokenizer=tokenizer, accelerator="ort")
+
+def load_ipex_pipeline(task: str, model_name: str):
+    """Load a model optimized for BF16 with Intel Extension for PyTorch.
+    
+    Returns a callable with the same inputs and outputs as a text-classification
+    pipeline, so the batch workers can use either backend.
+    """
+    try:
+        import intel_extension_for_pytorch as ipex
+    except ImportError as e:
+        raise RuntimeError("AI_MODEL_BACKEND=ipex requires intel-extension-for-pytorch") from e
+    
+    # torch has already initialized OpenMP at import, so set the thread count through its
+    # API. Core pinning (numactl, or KMP_AFFINITY with Intel OpenMP) belongs to the launcher.
+    torch.set_num_threads(INFERENCE_THREADS)
+    
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    model = ipex.optimize(model, dtype=torch.bfloat16)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    config = model.config
+    
+    # Same score function the text-classification pipeline picks for this model
+    multi_label = config.problem_type == "multi_label_classification" or config.num_labels == 1
+    
+    def predict(texts, batch_size=MAX_BATCH, **tokenizer_kwargs):
+        results = []
+        for i in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", **tokenizer_kwargs)
+            
+            # Autocast state is per thread, so enter it where inference actually runs
+            with torch.cpu.amp.autocast(dtype=torch.bfloat16), torch.no_grad():
+                logits = model(**inputs).logits
+            
+            # BF16 tensors cannot be converted to NumPy, so score in float32
+            logits = logits.float()
+            probs = logits.sigmoid() if multi_label else logits.softmax(-1)
+            scores, label_ids = probs.max(-1)
+            results.extend(
+                {"label": config.id2label[label_id], "score": score}
+                for label_id, score in zip(label_ids.tolist(), scores.tolist())
+            )
+        return results
+    
+    return predict
+
+def load_shared_pipeline(task: str, model_name: str):
+    """Load a PyTorch pipeline whose weights are memory-mapped from a shared checkpoint"""
+    checkpoint = os.path.join(SHARED_MODEL_DIR, model_name.replace('/', '--') + '.pt')
+    
+    # One worker writes the checkpoint while the others wait; the rename keeps readers
+    # from seeing a partial file
+    if not os.path.exists(checkpoint):
+        with file_lock(f"{checkpoint}.lock"):
+            if not os.path.exists(checkpoint):
+                model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+                state_dict = model.state_dict()
+                tmp_path = f"{checkpoint}.{os.getpid()}.tmp"
+                torch.save({
+                    "state_dict": state_dict,
+                    # Non-persistent buffers (e.g. position ids) are not part of the state dict
+                    "buffers": {name: buf for name, buf in model.named_buffers() if name not in state_dict}
+                }, tmp_path)
+                os.replace(tmp_path, checkpoint)
+                del model, state_dict
+    
+    # Build the module without allocating weights, then attach copy-on-write mappings of
+    # the checkpoint. Inference never writes to them, so the page cache keeps a single
+    # copy for all workers.
+    config = AutoConfig.from_pretrained(model_name)
+    with torch.device('meta'):
+        model = AutoModelForSequenceClassification.from_config(config)
+    
+    saved = torch.load(checkpoint, map_location='cpu', mmap=True, weights_only=True)
+    model.load_state_dict(saved["state_dict"], assign=True)
+    for name, buf in saved["buffers"].items():
+        module_name, _, buffer_name = name.rpartition('.')
+        model.get_submodule(module_name).register_buffer(buffer_name, buf, persistent=False)
+    model.eval()
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return pipeline(task, model=model, tokenizer=tokenizer, device=-1)
+
+def load_model_pipeline(task: str, model_name: str):
+    """Load a classification pipeline on the configured inference backend"""
+    if MODEL_BACKEND == 'ipex':
+        return load_ipex_pipeline(task, model_name)
+    if MODEL_BACKEND == 'torch':
+        return load_shared_pipeline(task, model_name)
+    return load_quantized_pipeline(task, model_name)
+
+async def drain_batch(queue: asyncio.Queue, window: float) -> List:
+    """Wait for one item, then collect up to MAX_BATCH items arriving within window seconds"""
+    loop = asyncio.get_running_loop()
+    items = [await queue.get()]
+    deadline = loop.time() + window
+    while len(items) < MAX_BATCH:
+        if not queue.empty():
+            items.append(queue.get_nowait())
+            continue
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            items.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return items
+
+async def batch_worker(queue: asyncio.Queue, model):
+    """Collect queued texts into small batches and run the model once per batch"""
+    while True:
+        items = await drain_batch(queue, BATCH_WINDOW)
+        
+        try:
+            # Run inference off the event loop, on the executor shared by both models
+            results = await asyncio.get_running_loop().run_in_executor(
+                inference_executor,
+                functools.partial(
+                    model,
+                    [text for text, _ in items],
+                    batch_size=MAX_BATCH,
+                    **TOKENIZER_KWARGS
+                )
+            )
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            continue
+        
+        for (_, fut), result in zip(items, results):
+            if not fut.done():
+                fut.set_result(result)
+
+async def run_batched(queue: asyncio.Queue, text: str) -> Dict:
+    """Submit a text to a batch worker and wait for its prediction"""
+    fut = asyncio.get_running_loop().create_future()
+    await queue.put((text[:MAX_MODEL_CHARS], fut))
+    return await fut
+
+async def cache_read_worker(queue: asyncio.Queue):
+    """Resolve queued Redis lookups with one MGET per batch"""
+    while True:
+        # Only take what is already queued so single lookups are not delayed
+        items = await drain_batch(queue, 0)
+        
+        try:
+            values = await redis_client.mget([key for key, _ in items])
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            continue
+        
+        for (_, fut), value in zip(items, values):
+            if not fut.done():
+                fut.set_result(value)
+
+async def cache_write_worker(queue: asyncio.Queue):
+    """Flush queued Redis writes through one pipeline per batch"""
+    logger = logging.getLogger(__name__)
+    while True:
+        items = await drain_batch(queue, 0)
+        
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, ttl, value in items:
+                    pipe.setex(key, ttl, value)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ Cache write failed: {e}")
+
+async def cache_get(key: str) -> Optional[bytes]:
+    """Look up a Redis key through the batched reader"""
+    fut = asyncio.get_running_loop().create_future()
+    await cache_read_queue.put((key, fut))
+    return await fut
+
+def cache_set(key: str, ttl: int, value: bytes):
+    """Queue a Redis write for the next pipelined flush"""
+    cache_write_queue.put_nowait((key, ttl, value))
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize models and database connections"""
     global sentiment_analyzer, content_classifier, redis_client, mongo_client
+    global sentiment_queue, moderation_queue
+    global cache_read_queue, cache_write_queue
     
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
@@ -84,48 +579,68 @@ async def startup_event():
     
     # Initialize Redis
     try:
-        redis_client = redis.Redis(
+        redis_client = aioredis.Redis(
             host=os.getenv('REDIS_HOST', 'localhost'),
             port=int(os.getenv('REDIS_PORT', 6379)),
             db=0,
-            decode_responses=True
+            decode_responses=False
         )
-        redis_client.ping()
+        await redis_client.ping()
         logger.info("✅ Redis connected")
+        
+        cache_read_queue = asyncio.Queue()
+        cache_write_queue = asyncio.Queue()
+        background_jobs.append(asyncio.create_task(cache_read_worker(cache_read_queue)))
+        background_jobs.append(asyncio.create_task(cache_write_worker(cache_write_queue)))
     except Exception as e:
         logger.error(f"❌ Redis connection failed: {e}")
     
     # Initialize MongoDB
     try:
-        mongo_client = pymongo.MongoClient(
+        mongo_client = AsyncIOMotorClient(
             os.getenv('MONGODB_URI', 'mongodb://localhost:27017')
         )
-        mongo_client.admin.command('ping')
+        await mongo_client.admin.command('ping')
         logger.info("✅ MongoDB connected")
+        
+        # Indexes backing the recommendation and analytics queries
+        db = mongo_client['crown-social']
+        await db.interactions.create_index([("user_id", 1), ("timestamp", -1)])
+        await db.posts.create_index([("isActive", 1), ("visibility", 1), ("createdAt", -1)])
+        await db.posts.create_index([("author", 1), ("createdAt", -1)])
     except Exception as e:
         logger.error(f"❌ MongoDB connection failed: {e}")
     
     # Initialize ML models
     try:
         # Sentiment Analysis Model
-        sentiment_analyzer = pipeline(
+        sentiment_analyzer = load_model_pipeline(
             "sentiment-analysis",
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-            device=-1  # Use CPU
+            "cardiffnlp/twitter-roberta-base-sentiment-latest"
         )
-        logger.info("✅ Sentiment analyzer loaded")
+        logger.info(f"✅ Sentiment analyzer loaded ({MODEL_BACKEND})")
         
         # Content Classification Model
-        content_classifier = pipeline(
+        content_classifier = load_model_pipeline(
             "text-classification",
-            model="unitary/toxic-bert",
-            device=-1
+            "unitary/toxic-bert"
         )
-        logger.info("✅ Content classifier loaded")
+        logger.info(f"✅ Content classifier loaded ({MODEL_BACKEND})")
         
     except Exception as e:
         logger.error(f"❌ Model loading failed: {e}")
     
+    # Track the shared TF-IDF vectorizer written by the launcher
+    background_jobs.append(asyncio.create_task(reload_vectorizer()))
+    
+    # Start batch workers
+    if sentiment_analyzer:
+        sentiment_queue = asyncio.Queue()
+        background_jobs.append(asyncio.create_task(batch_worker(sentiment_queue, sentiment_analyzer)))
+    if content_classifier:
+        moderation_queue = asyncio.Queue()
+        background_jobs.append(asyncio.create_task(batch_worker(moderation_queue, content_classifier)))
+    
     logger.info("🚀 Crown AI Service ready!")
 
 @app.get("/health")
@@ -141,6 +656,125 @@ async def health_check():
         }
     }
 
+async def compute_sentiment(content: str) -> Dict:
+    """Run the sentiment model and derive emotion scores for a text"""
+    # Get sentiment from transformer model
+    result = await run_batched(sentiment_queue, content)
+    
+    # Get detailed emotions using TextBlob
+    blob = TextBlob(content)
+    
+    # Convert to standardized format
+    sentiment_label = result['label'].lower()
+    confidence = result['score']
+    
+    # Map transformer labels to our format
+    if sentiment_label in ['positive', 'pos']:
+        sentiment = 'positive'
+    elif sentiment_label in ['negative', 'neg']:
+        sentiment = 'negative'
+    else:
+        sentiment = 'neutral'
+    
+    # Calculate emotion scores (simplified)
+    emotions = {
+        "joy": max(0, blob.sentiment.polarity) if sentiment == 'positive' else 0,
+        "anger": abs(min(0, blob.sentiment.polarity)) if sentiment == 'negative' else 0,
+        "sadness": abs(min(0, blob.sentiment.polarity)) * 0.7 if sentiment == 'negative' else 0,
+        "fear": abs(min(0, blob.sentiment.polarity)) * 0.3 if sentiment == 'negative' else 0,
+        "surprise": abs(blob.sentiment.polarity) * 0.5 if sentiment == 'neutral' else 0
+    }
+    
+    return {
+        "sentiment": sentiment,
+        "confidence": confidence,
+        "emotions": emotions,
+        "timestamp": datetime.utcnow()
+    }
+
+async def compute_moderation(content: str) -> Dict:
+    """Run the toxicity model and keyword checks for a text"""
+    # Run content classification
+    result = await run_batched(moderation_queue, content)
+    
+    # Analyze toxicity
+    is_toxic = result['label'] == 'TOXIC'
+    confidence = result['score']
+    
+    # Calculate risk categories
+    categories = []
+    risk_score = 0
+    
+    if is_toxic:
+        risk_score = confidence
+        categories.append("toxicity")
+        
+        # Additional checks for specific categories in a single pass
+        content_lower = content.lower()
+        categories_hit = {category for _, (category, _) in keyword_automaton.iter(content_lower)}
+        
+        for category, (_, risk) in KEYWORD_CATEGORIES.items():
+            if category in categories_hit:
+                categories.append(category)
+                risk_score += risk
+    
+    risk_score = min(risk_score, 1.0)
+    is_appropriate = risk_score < 0.5
+    
+    return {
+        "is_appropriate": is_appropriate,
+        "confidence": confidence,
+        "categories": categories,
+        "risk_score": risk_score
+    }
+
+async def cached_compute(cache_key: str, ttl: int, compute) -> Dict:
+    """Resolve a result from the L1 cache, then Redis, then compute it.
+    
+    Concurrent misses for the same key share a single computation.
+    """
+    while True:
+        cached = l1_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        pending = inflight.get(cache_key)
+        if pending is None:
+            break
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # Retry only when the leading request was cancelled, not this one
+            if not pending.cancelled():
+                raise
+    
+    fut = asyncio.get_running_loop().create_future()
+    inflight[cache_key] = fut
+    try:
+        data = None
+        if cache_read_queue is not None:
+            cached = await cache_get(cache_key)
+            if cached:
+                data = orjson.loads(cached)
+        
+        if data is None:
+            data = await compute()
+            if cache_write_queue is not None:
+                cache_set(cache_key, ttl, orjson.dumps(data, option=orjson.OPT_NAIVE_UTC))
+        
+        l1_cache[cache_key] = data
+        fut.set_result(data)
+        return data
+    except Exception as e:
+        fut.set_exception(e)
+        fut.exception()  # mark as retrieved when nobody else was waiting
+        raise
+    finally:
+        # Cancellation skips the handlers above; release waiters so they retry
+        if not fut.done():
+            fut.cancel()
+        del inflight[cache_key]
+
 @app.post("/analyze/sentiment", response_model=SentimentResult)
 async def analyze_sentiment(analysis: PostAnalysis):
     """Analyze sentiment of post content"""
@@ -148,57 +782,14 @@ async def analyze_sentiment(analysis: PostAnalysis):
         raise HTTPException(status_code=503, detail="Sentiment analyzer not available")
     
     try:
-        # Detect language
-        try:
-            lang = detect(analysis.content)
-        except:
-            lang = 'unknown'
-        
-        # Get sentiment from transformer model
-        result = sentiment_analyzer(analysis.content)
-        
-        # Get detailed emotions using TextBlob
-        blob = TextBlob(analysis.content)
-        
-        # Convert to standardized format
-        sentiment_label = result[0]['label'].lower()
-        confidence = result[0]['score']
-        
-        # Map transformer labels to our format
-        if sentiment_label in ['positive', 'pos']:
-            sentiment = 'positive'
-        elif sentiment_label in ['negative', 'neg']:
-            sentiment = 'negative'
-        else:
-            sentiment = 'neutral'
-        
-        # Calculate emotion scores (simplified)
-        emotions = {
-            "joy": max(0, blob.sentiment.polarity) if sentiment == 'positive' else 0,
-            "anger": abs(min(0, blob.sentiment.polarity)) if sentiment == 'negative' else 0,
-            "sadness": abs(min(0, blob.sentiment.polarity)) * 0.7 if sentiment == 'negative' else 0,
-            "fear": abs(min(0, blob.sentiment.polarity)) * 0.3 if sentiment == 'negative' else 0,
-            "surprise": abs(blob.sentiment.polarity) * 0.5 if sentiment == 'neutral' else 0
-        }
-        
-        # Cache result
-        cache_key = f"sentiment:{hash(analysis.content)}"
-        result_data = {
-            "sentiment": sentiment,
-            "confidence": confidence,
-            "emotions": emotions,
-            "language": lang,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        if redis_client:
-            redis_client.setex(cache_key, 3600, json.dumps(result_data))
-        
-        return SentimentResult(
-            sentiment=sentiment,
-            confidence=confidence,
-            emotions=emotions
+        result_data = await cached_compute(
+            ckey("sentiment", analysis.content),
+            3600,
+            lambda: compute_sentiment(analysis.content)
         )
+        # Trusted data from our own model or cache: skip constructor validation and
+        # leave the single check to FastAPI's response_model
+        return SentimentResult.model_construct(**result_data)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
@@ -210,65 +801,14 @@ async def moderate_content(analysis: PostAnalysis):
         raise HTTPException(status_code=503, detail="Content classifier not available")
     
     try:
-        # Check cache first
-        cache_key = f"moderation:{hash(analysis.content)}"
-        if redis_client:
-            cached = redis_client.get(cache_key)
-            if cached:
-                cached_data = json.loads(cached)
-                return ContentModerationResult(**cached_data)
-        
-        # Run content classification
-        result = content_classifier(analysis.content)
-        
-        # Analyze toxicity
-        is_toxic = result[0]['label'] == 'TOXIC'
-        confidence = result[0]['score']
-        
-        # Calculate risk categories
-        categories = []
-        risk_score = 0
-        
-        if is_toxic:
-            risk_score = confidence
-            categories.append("toxicity")
-            
-            # Additional checks for specific categories
-            content_lower = analysis.content.lower()
-            
-            # Hate speech detection
-            hate_words = ['hate', 'racist', 'homophobic', 'sexist']
-            if any(word in content_lower for word in hate_words):
-                categories.append("hate_speech")
-                risk_score += 0.2
-            
-            # Violence detection
-            violence_words = ['kill', 'murder', 'violence', 'attack']
-            if any(word in content_lower for word in violence_words):
-                categories.append("violence")
-                risk_score += 0.3
-            
-            # Adult content detection
-            adult_words = ['explicit', 'nsfw', 'adult']
-            if any(word in content_lower for word in adult_words):
-                categories.append("adult_content")
-                risk_score += 0.1
-        
-        risk_score = min(risk_score, 1.0)
-        is_appropriate = risk_score < 0.5
-        
-        result_data = {
-            "is_appropriate": is_appropriate,
-            "confidence": confidence,
-            "categories": categories,
-            "risk_score": risk_score
-        }
-        
-        # Cache result
-        if redis_client:
-            redis_client.setex(cache_key, 7200, json.dumps(result_data))
-        
-        return ContentModerationResult(**result_data)
+        result_data = await cached_compute(
+            ckey("moderation", analysis.content),
+            7200,
+            lambda: compute_moderation(analysis.content)
+        )
+        # Trusted data from our own model or cache: skip constructor validation and
+        # leave the single check to FastAPI's response_model
+        return ContentModerationResult.model_construct(**result_data)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Content moderation failed: {str(e)}")
@@ -283,95 +823,113 @@ async def recommend_posts(request: RecommendationRequest):
         db = mongo_client['crown-social']
         
         # Get user's interaction history
-        user_interactions = list(db.interactions.find({
-            "user_id": request.user_id
-        }).limit(100).sort("timestamp", -1))
+        user_interactions = await db.interactions.find(
+            {"user_id": request.user_id},
+            projection={"post_id": 1}
+        ).limit(100).sort("timestamp", -1).to_list(length=100)
         
-        # Get all posts
-        posts = list(db.posts.find({
-            "isActive": True,
-            "visibility": {"$in": ["public", "friends"]}
-        }).limit(1000).sort("createdAt", -1))
+        # Stream candidate posts straight into columnar arrays
+        cursor = db.posts.find(
+            {
+                "isActive": True,
+                "visibility": {"$in": ["public", "friends"]}
+            },
+            projection={"_id": 1, "content": 1, "likesCount": 1, "commentsCount": 1, "sharesCount": 1}
+        ).sort("createdAt", -1).limit(MAX_CANDIDATES).batch_size(CANDIDATE_BATCH_SIZE)
+        
+        post_ids = []
+        post_contents = []
+        likes = np.empty(MAX_CANDIDATES, dtype=np.int32)
+        comments = np.empty(MAX_CANDIDATES, dtype=np.int32)
+        shares = np.empty(MAX_CANDIDATES, dtype=np.int32)
         
-        if not posts:
+        async for post in cursor:
+            i = len(post_ids)
+            post_ids.append(str(post['_id']))
+            post_contents.append(post.get('content', ''))
+            likes[i] = post.get('likesCount', 0)
+            comments[i] = post.get('commentsCount', 0)
+            shares[i] = post.get('sharesCount', 0)
+        
+        n = len(post_ids)
+        if not n:
             return {"recommendations": [], "algorithm": "fallback"}
         
-        # Extract user preferences from interactions
+        likes, comments, shares = likes[:n], comments[:n], shares[:n]
+        
+        # Extract user preferences from the likes among the last 100 interactions in a single join
+        liked_posts = db.interactions.aggregate([
+            {"$match": {"user_id": request.user_id}},
+            {"$sort": {"timestamp": -1}},
+            {"$limit": 100},
+            {"$match": {"type": "like"}},
+            {"$lookup": {"from": "posts", "localField": "post_id", "foreignField": "_id", "as": "p"}},
+            {"$unwind": "$p"},
+            {"$project": {"content": "$p.content", "tags": "$p.tags"}}
+        ])
+        
         user_liked_content = []
         user_categories = []
         
-        for interaction in user_interactions:
-            if interaction.get('type') == 'like':
-                # Find the liked post content
-                post = db.posts.find_one({"_id": interaction.get('post_id')})
-                if post:
-                    user_liked_content.append(post.get('content', ''))
-                    user_categories.extend(post.get('tags', []))
+        async for post in liked_posts:
+            user_liked_content.append(post.get('content', ''))
+            user_categories.extend(post.get('tags', []))
         
         if not user_liked_content:
             # Fallback: return trending posts
-            trending_posts = sorted(posts, key=lambda x: (
-                x.get('likesCount', 0) + 
-                x.get('commentsCount', 0) * 2 + 
-                x.get('sharesCount', 0) * 3
-            ), reverse=True)[:request.limit]
+            trending_scores = (likes + comments * 2 + shares * 3).tolist()
+            trending_posts = heapq.nlargest(request.limit, range(n), key=trending_scores.__getitem__)
             
             return {
-                "recommendations": [str(p['_id']) for p in trending_posts],
+                "recommendations": [post_ids[i] for i in trending_posts],
                 "algorithm": "trending_fallback",
                 "count": len(trending_posts)
             }
         
         # Content-based filtering using TF-IDF
-        all_content = user_liked_content + [post.get('content', '') for post in posts]
-        
-        vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        tfidf_matrix = vectorizer.fit_transform(all_content)
+        vectorizer = tfidf_vectorizer
+        if vectorizer is None:
+            # No shared vectorizer yet: fit on this request's texts
+            vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+            vectorizer.fit(user_liked_content + post_contents)
         
-        # Calculate similarity between user profile and posts
-        user_profile = tfidf_matrix[:len(user_liked_content)].mean(axis=0)
-        post_vectors = tfidf_matrix[len(user_liked_content):]
+        # Calculate similarity between user profile and posts. Post rows are
+        # already L2-normalized by the vectorizer, so only the profile needs it.
+        user_profile = sp.csr_matrix(vectorizer.transform(user_liked_content).mean(axis=0))
+        user_profile = normalize(user_profile, copy=False)
+        post_vectors = vectorizer.transform(post_contents)
         
-        similarities = cosine_similarity(user_profile, post_vectors).flatten()
+        similarities = (post_vectors @ user_profile.T).toarray().ravel()
         
         # Combine with engagement scores
-        scored_posts = []
-        for i, post in enumerate(posts):
-            engagement_score = (
-                post.get('likesCount', 0) * 0.3 +
-                post.get('commentsCount', 0) * 0.4 +
-                post.get('sharesCount', 0) * 0.3
-            )
-            
-            # Normalize engagement score
-            engagement_score = min(engagement_score / 100, 1.0)
-            
-            # Combined score
-            final_score = similarities[i] * 0.7 + engagement_score * 0.3
-            
-            scored_posts.append({
-                "post_id": str(post['_id']),
-                "score": final_score,
-                "content_similarity": similarities[i],
-                "engagement_score": engagement_score
-            })
-        
-        # Sort by score and exclude seen posts if requested
+        engagement_scores = np.minimum(
+            (likes * 0.3 + comments * 0.4 + shares * 0.3) / 100, 1.0
+        )
+        final_scores = similarities * 0.7 + engagement_scores * 0.3
+        
+        # Exclude seen posts if requested
         if request.exclude_seen:
             seen_post_ids = {str(i.get('post_id')) for i in user_interactions}
-            scored_posts = [p for p in scored_posts if p['post_id'] not in seen_post_ids]
+            seen_mask = np.fromiter((pid in seen_post_ids for pid in post_ids), dtype=bool, count=len(post_ids))
+            final_scores[seen_mask] = -np.inf
         
-        scored_posts.sort(key=lambda x: x['score'], reverse=True)
+        # Top-k selection without sorting every post
+        k = min(request.limit, int(np.isfinite(final_scores).sum()))
+        if k > 0:
+            top = np.argpartition(-final_scores, k - 1)[:k]
+            top = top[np.argsort(-final_scores[top])]
+        else:
+            top = []
         
-        recommendations = [p['post_id'] for p in scored_posts[:request.limit]]
+        recommendations = [post_ids[i] for i in top]
         
         # Cache recommendations
         cache_key = f"recommendations:{request.user_id}"
-        if redis_client:
-            redis_client.setex(cache_key, 1800, json.dumps({
+        if cache_write_queue is not None:
+            cache_set(cache_key, 1800, orjson.dumps({
                 "recommendations": recommendations,
-                "generated_at": datetime.utcnow().isoformat()
-            }))
+                "generated_at": datetime.utcnow()
+            }, option=orjson.OPT_NAIVE_UTC))
         
         return {
             "recommendations": recommendations,
@@ -394,7 +952,7 @@ async def analyze_user_interests(user_interest: UserInterest):
         
         # Analyze interaction patterns
         interaction_analysis = {}
-        content_keywords = []
+        keyword_counts = Counter()
         
         for interaction in user_interest.interaction_history:
             interaction_type = interaction.get('type')
@@ -404,16 +962,13 @@ async def analyze_user_interests(user_interest: UserInterest):
             
             # Extract content keywords if available
             if 'content' in interaction:
-                blob = TextBlob(interaction['content'])
-                content_keywords.extend([word.lower() for word in blob.words if len(word) > 3])
+                keyword_counts.update(extract_keywords(interaction['content']))
         
         # Find most common keywords
-        from collections import Counter
-        keyword_counts = Counter(content_keywords)
-        top_interests = [word for word, count in keyword_counts.most_common(20)]
+        top_interests = [word.decode('utf-8') for word, count in keyword_counts.most_common(20)]
         
         # Update user profile in database
-        db.user_profiles.update_one(
+        await db.user_profiles.update_one(
             {"user_id": user_interest.user_id},
             {
                 "$set": {
@@ -448,32 +1003,36 @@ async def get_engagement_analytics(user_id: str, days: int = 7):
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Get user's posts in the time range
-        posts = list(db.posts.find({
-            "author": user_id,
-            "createdAt": {"$gte": start_date, "$lte": end_date}
-        }))
+        # Aggregate engagement per day on the database side
+        daily_buckets = await db.posts.aggregate([
+            {"$match": {
+                "author": user_id,
+                "createdAt": {"$gte": start_date, "$lte": end_date}
+            }},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}},
+                "posts": {"$sum": 1},
+                "likes": {"$sum": "$likesCount"},
+                "comments": {"$sum": "$commentsCount"},
+                "shares": {"$sum": "$sharesCount"},
+                "views": {"$sum": "$viewsCount"}
+            }}
+        ]).to_list(length=None)
         
         # Calculate metrics
-        total_posts = len(posts)
-        total_likes = sum(post.get('likesCount', 0) for post in posts)
-        total_comments = sum(post.get('commentsCount', 0) for post in posts)
-        total_shares = sum(post.get('sharesCount', 0) for post in posts)
-        total_views = sum(post.get('viewsCount', 0) for post in posts)
+        total_posts = sum(b['posts'] for b in daily_buckets)
+        total_likes = sum(b['likes'] for b in daily_buckets)
+        total_comments = sum(b['comments'] for b in daily_buckets)
+        total_shares = sum(b['shares'] for b in daily_buckets)
+        total_views = sum(b['views'] for b in daily_buckets)
         
         avg_engagement = (total_likes + total_comments + total_shares) / max(total_posts, 1)
         
         # Engagement trend analysis
-        daily_engagement = {}
-        for post in posts:
-            date_key = post['createdAt'].strftime('%Y-%m-%d')
-            if date_key not in daily_engagement:
-                daily_engagement[date_key] = 0
-            daily_engagement[date_key] += (
-                post.get('likesCount', 0) + 
-                post.get('commentsCount', 0) + 
-                post.get('sharesCount', 0)
-            )
+        daily_engagement = {
+            b['_id']: b['likes'] + b['comments'] + b['shares']
+            for b in sorted(daily_buckets, key=lambda b: b['_id'])
+        }
         
         return {
             "user_id": user_id,
@@ -495,6 +1054,12 @@ async def get_engagement_analytics(user_id: str, days: int = 7):
 
 if __name__ == "__main__":
     import uvicorn
+    logging.basicConfig(level=logging.INFO)
     port = int(os.getenv("AI_SERVICE_PORT", 8000))
-    print(f"🤖 Crown AI Service (Python) starting on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    
+    # Refit the shared vectorizer here, once, rather than in every worker.
+    # Launching with `uvicorn main:app` skips this, so the vectorizer is never refreshed.
+    threading.Thread(target=vectorizer_refit_loop, daemon=True).start()
+    
+    print(f"🤖 Crown AI Service (Python) starting on port {port} with {SERVICE_WORKERS} workers")
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=SERVICE_WORKERS, loop="uvloop")